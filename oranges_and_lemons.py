@@ -3,14 +3,15 @@ from PySide6.QtWidgets import (
     QLabel, QWidget, QGridLayout, QFrame, QScrollArea, QTableWidget, QSizePolicy
 )
 from PySide6.QtCore import (
-    Signal, QTimer, QObject, Qt
+    Signal, QTimer, QObject, Qt, QCoreApplication
 )
 from PySide6.QtGui import QIcon
 from enum import IntEnum
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import matplotlib.pyplot as plt
-from matplotlib.ticker import MaxNLocator
-import os, sys, random, math
+import os, sys, random, math, time, argparse, sqlite3, locale
+try:
+    import curses
+except ImportError:  # not bundled with Python on Windows
+    curses = None
 
 
 WIDTH = 1400
@@ -19,13 +20,23 @@ MARGIN = 50
 GAMETIME = 900 # 900
 O1PROB = 6.0/GAMETIME # 0.000667 for 900
 L1PROB = 7.5/GAMETIME # 0.000833 for 900
-O2PROB = random.randint(4,8) / GAMETIME
-L2PROB = random.uniform(6.5, 14.5 + 1e-9) / GAMETIME
 PROB_NOISE_SCALE = 0.0003  # ±0.0001 variation
-O1PROB_NOISY = O1PROB + random.uniform(-PROB_NOISE_SCALE, PROB_NOISE_SCALE)
-L1PROB_NOISY = L1PROB + random.uniform(-PROB_NOISE_SCALE, PROB_NOISE_SCALE)
-O2PROB_NOISY = O2PROB + random.uniform(-PROB_NOISE_SCALE, PROB_NOISE_SCALE)
-L2PROB_NOISY = L2PROB + random.uniform(-PROB_NOISE_SCALE, PROB_NOISE_SCALE)
+
+class GameParameters:
+    """
+    Per-game arrival probabilities in (o1, l1, o2, l2) order, plus the noisy ones
+    quotes and offers are priced from. All of a game's randomness comes from `rng`,
+    so games in the same process never share state.
+    """
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.randrange(2**32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        o2 = self.rng.randint(4,8) / GAMETIME
+        l2 = self.rng.uniform(6.5, 14.5 + 1e-9) / GAMETIME
+        self.probs = (O1PROB, L1PROB, o2, l2)
+        self.noisyProbs = tuple(p + self.rng.uniform(-PROB_NOISE_SCALE, PROB_NOISE_SCALE) for p in self.probs)
 
 class Side(IntEnum):
     IGNORED = 0
@@ -39,28 +50,282 @@ class Signals(QObject):
     traded = Signal(object)
     fruitChanges = Signal(int, int, int, int)
     timeChanged = Signal(int) # in seconds
+    estimatesChanged = Signal(object)
     gameOver = Signal()
     def __init__(self):
         super().__init__()
 
 signals = Signals()
 
-def simulate_final_counts():
+def simulate_final_counts(params):
     """Run one game and return (o1, l1, o2, l2) at t = GAMETIME."""
     o1 = l1 = o2 = l2 = 0
-    p_o1 = O1PROB
-    p_l1 = L1PROB
-    p_o2 = O2PROB
-    p_l2 = L2PROB 
+    p_o1, p_l1, p_o2, p_l2 = params.probs
+    rng = params.rng
 
     for _ in range(GAMETIME):
-        if random.random() < p_o1: o1 += 1
-        if random.random() < p_l1: l1 += 1
-        if random.random() < p_o2: o2 += 1
-        if random.random() < p_l2: l2 += 1
+        if rng.random() < p_o1: o1 += 1
+        if rng.random() < p_l1: l1 += 1
+        if rng.random() < p_o2: o2 += 1
+        if rng.random() < p_l2: l2 += 1
     return o1, l1, o2, l2
 
 
+def play_headless_game(seed=None):
+    """Play one game without a UI and return (seed, (o1, l1, o2, l2), offered trades)."""
+    params = GameParameters(seed)
+    p_o1, p_l1, p_o2, p_l2 = params.probs
+    rng = params.rng
+    o1 = l1 = o2 = l2 = 0
+    trades = []
+    nextTrade = next_trade_delay(params) / 1000
+
+    for t in range(1, GAMETIME + 1):
+        if p_o1 > rng.random(): o1 += 1
+        if p_l1 > rng.random(): l1 += 1
+        if p_o2 > rng.random(): o2 += 1
+        if p_l2 > rng.random(): l2 += 1
+        if t >= nextTrade:
+            trades.extend(offer_batch(params, (t, o1, l1, o2, l2)))
+            nextTrade += next_trade_delay(params) / 1000
+    return params.seed, (o1, l1, o2, l2), trades
+
+
+def default_results_path():
+    """results.db in the per-user data directory, so the game can be started from anywhere."""
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+        directory = os.path.join(base, "OrangesAndLemons")
+    elif sys.platform == "darwin":
+        directory = os.path.expanduser("~/Library/Application Support/OrangesAndLemons")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+        directory = os.path.join(base, "oranges_and_lemons")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, "results.db")
+
+
+class ResultsStore:
+    """
+    SQLite store of finished games and their trades, for analysis across many games.
+    Every offer of a game is stored, with side IGNORED if it wasn't taken, along
+    with buys and sells of the underlying. `source` is "headless", "qt" or "terminal".
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS games (
+            id INTEGER PRIMARY KEY,
+            seed INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            played_at REAL NOT NULL,
+            score REAL,
+            o1 INTEGER NOT NULL,
+            l1 INTEGER NOT NULL,
+            o2 INTEGER NOT NULL,
+            l2 INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS contracts (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS trades (
+            game_id INTEGER NOT NULL REFERENCES games(id),
+            contract_id INTEGER NOT NULL REFERENCES contracts(id),
+            side INTEGER NOT NULL,
+            time_remaining INTEGER NOT NULL,
+            price REAL NOT NULL,
+            settle REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS games_seed ON games(seed);
+        CREATE INDEX IF NOT EXISTS games_source ON games(source);
+        CREATE INDEX IF NOT EXISTS games_played_at ON games(played_at);
+        CREATE INDEX IF NOT EXISTS trades_game ON trades(game_id);
+        CREATE INDEX IF NOT EXISTS trades_contract_remaining ON trades(contract_id, time_remaining);
+        -- running totals kept up to date on insert, so reports don't grow with the number of games
+        CREATE TABLE IF NOT EXISTS trade_totals (
+            contract_id INTEGER NOT NULL REFERENCES contracts(id),
+            source TEXT NOT NULL,
+            side INTEGER NOT NULL,
+            time_remaining INTEGER NOT NULL,
+            trades INTEGER NOT NULL,
+            price REAL NOT NULL,
+            settle REAL NOT NULL,
+            abs_error REAL NOT NULL,
+            PRIMARY KEY (contract_id, source, side, time_remaining)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = default_results_path()
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self.contractIds = dict((name, id) for id, name in self.conn.execute("SELECT id, name FROM contracts"))
+
+    def contractId(self, name):
+        if name not in self.contractIds:
+            self.contractIds[name] = self.conn.execute("INSERT INTO contracts (name) VALUES (?)", (name,)).lastrowid
+        return self.contractIds[name]
+
+    def close(self):
+        self.conn.close()
+
+    def recordGame(self, seed, source, fruitValues, trades, score=None):
+        self.recordGames([(seed, source, time.time(), fruitValues, trades, score)])
+
+    def recordGames(self, games):
+        """Insert (seed, source, playedAt, fruitValues, trades, score) tuples in a single transaction."""
+        totals = {}
+        with self.conn:
+            for seed, source, playedAt, fruitValues, trades, score in games:
+                o1, l1, o2, l2 = fruitValues
+                gameId = self.conn.execute(
+                    "INSERT INTO games (seed, source, played_at, score, o1, l1, o2, l2) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (seed, source, playedAt, score, o1, l1, o2, l2),
+                ).lastrowid
+                rows = [
+                    (gameId, self.contractId(trade.text), int(trade.side), GAMETIME - trade.time,
+                     trade.value, float(trade.func(o1, l1, o2, l2)))
+                    for trade in trades
+                ]
+                self.conn.executemany("INSERT INTO trades VALUES (?, ?, ?, ?, ?, ?)", rows)
+                for _, contractId, side, remaining, price, settle in rows:
+                    total = totals.setdefault((contractId, source, side, remaining), [0, 0.0, 0.0, 0.0])
+                    total[0] += 1
+                    total[1] += price
+                    total[2] += settle
+                    total[3] += abs(settle - price)
+            self.conn.executemany(
+                """
+                INSERT INTO trade_totals VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (contract_id, source, side, time_remaining) DO UPDATE SET
+                    trades = trades + excluded.trades,
+                    price = price + excluded.price,
+                    settle = settle + excluded.settle,
+                    abs_error = abs_error + excluded.abs_error
+                """,
+                [key + tuple(total) for key, total in totals.items()],
+            )
+
+    def pnlByContract(self, source=None):
+        """Rows of (contract, offers, taken, P&L on taken trades, average P&L of buying every offer)."""
+        return self.conn.execute(f"""
+            SELECT name, offers, taken, pnl, buyPnl
+            FROM (
+                SELECT contract_id,
+                       SUM(trades) AS offers,
+                       SUM(CASE WHEN side != {int(Side.IGNORED)} THEN trades ELSE 0 END) AS taken,
+                       TOTAL(CASE side WHEN {int(Side.BUY)} THEN settle - price
+                                       WHEN {int(Side.SELL)} THEN price - settle END) AS pnl,
+                       SUM(settle - price) / SUM(trades) AS buyPnl
+                FROM trade_totals
+                WHERE ?1 IS NULL OR source = ?1
+                GROUP BY contract_id
+            )
+            JOIN contracts ON contracts.id = contract_id
+            ORDER BY name
+        """, (source,)).fetchall()
+
+    def pricingErrorByTimeRemaining(self, bucket=60, source=None, contract=None):
+        """
+        Rows of (contract, seconds remaining bucket, offers, mean error, mean absolute error),
+        error = settle - price. Grouped per contract since the 2 ^ contracts are orders of
+        magnitude larger than the rest.
+        """
+        return self.conn.execute("""
+            SELECT name, remaining, offers, error, absError
+            FROM (
+                SELECT contract_id,
+                       (time_remaining / ?1) * ?1 AS remaining,
+                       SUM(trades) AS offers,
+                       SUM(settle - price) / SUM(trades) AS error,
+                       SUM(abs_error) / SUM(trades) AS absError
+                FROM trade_totals
+                WHERE ?2 IS NULL OR source = ?2
+                GROUP BY contract_id, remaining
+            )
+            JOIN contracts ON contracts.id = contract_id
+            WHERE ?3 IS NULL OR name = ?3
+            ORDER BY name, remaining
+        """, (bucket, source, contract)).fetchall()
+
+
+def run_headless(store, games, seed=None, batch=1000):
+    """Play and store `games` headless games, committing every `batch` games."""
+    pending = []
+    for i in range(games):
+        gameSeed, fruitValues, trades = play_headless_game(None if seed is None else seed + i)
+        pending.append((gameSeed, "headless", time.time(), fruitValues, trades, None))
+        if len(pending) == batch:
+            store.recordGames(pending)
+            pending = []
+    if pending:
+        store.recordGames(pending)
+
+
+def print_report(store, source=None, contract=None):
+    print(f"{'contract':<32} {'offers':>8} {'taken':>6} {'taken P&L':>12} {'avg buy P&L':>12}")
+    for name, offers, taken, pnl, buyPnl in store.pnlByContract(source):
+        print(f"{name:<32} {offers:>8} {taken:>6} {pnl:>12,.2f} {buyPnl:>12,.2f}")
+    lastName = None
+    for name, remaining, offers, error, absError in store.pricingErrorByTimeRemaining(source=source, contract=contract):
+        if name != lastName:
+            print()
+            print(name)
+            print(f"{'remaining':>10} {'offers':>8} {'mean error':>12} {'mean abs error':>15}")
+            lastName = name
+        print(f"{remaining:>10} {offers:>8} {error:>12,.2f} {absError:>15,.2f}")
+
+
+class Session:
+    """
+    Round lifecycle shared by the Qt and terminal front ends: owns the player and
+    rate estimator, stores finished games and keeps score across rounds played in
+    the same process.
+    """
+    def __init__(self, store=None, source="qt", params=None, runs=()):
+        self.round = 1
+        self.params = params if params is not None else GameParameters()
+        self.scores = []
+        self.store = store
+        self.source = source
+        self.player = Player()
+        self.rateEstimator = RateEstimator(runs)
+
+    def recordScore(self, score):
+        self.scores.append(score)
+
+    def newRound(self):
+        self.params = GameParameters()
+        self.round += 1
+
+    def startRound(self, runs):
+        self.player.reset()
+        self.rateEstimator.reset(runs)
+
+    def endRound(self, fruitValues, offers):
+        """Score the round and store it with every offer shown. Returns the score."""
+        score = self.player.calculateScore(fruitValues)
+        self.recordScore(score)
+        if self.store is not None:
+            trades = offers + self.player.underlyingTrades
+            self.store.recordGame(self.params.seed, self.source, fruitValues, trades, score)
+        return score
+
+    def summary(self):
+        if not self.scores:
+            return f"Round {self.round}"
+        total = sum(self.scores)
+        wins = sum(1 for score in self.scores if score > 0)
+        return (
+            f"Round {self.round}\n"
+            f"Total: {total:,.2f}\n"
+            f"Average: {total / len(self.scores):,.2f}\n"
+            f"Best: {max(self.scores):,.2f}  Worst: {min(self.scores):,.2f}\n"
+            f"Won {wins}/{len(self.scores)}"
+        )
+
 
 class Panel(QFrame):
     def __init__(self):
@@ -96,6 +361,10 @@ class TradeHistory(QFrame):
         signals.sell.connect(self.captureSell)
         signals.traded.connect(self.captureTrade)
 
+    def reset(self):
+        while self.historyLayout.count():
+            self.historyLayout.takeAt(0).widget().deleteLater()
+
     def addLabel(self, label: QLabel):
         label.setContentsMargins(0, 0, 0, 8)
         self.historyLayout.insertWidget(0, label)
@@ -119,19 +388,85 @@ class TradeHistory(QFrame):
         label.setStyleSheet(f"color: {color}; font-size: 16px;")
         self.addLabel(label)
 
-class TrackerInfo(QFrame):
-    def __init__(self):
-        super().__init__()
+class Underlying(QObject):
+    """Quoted price of total oranges * total lemons, an OU walk around its expected value."""
+    K_REVERT = 0.4                # 0–1  : 0 = pure random walk, 1 = snap to EV
+    SIGMA0   = 1.8                 # base volatility
+    SIGMA_FLOOR = 1.0
+    WINDOW = 30
 
-        # underlying value
-        self.underlyingValue = 0
+    def __init__(self, params):
+        super().__init__()
+        self.reset(params)
+        signals.fruitChanges.connect(self.getFruitValues)
+        signals.timeChanged.connect(self.getTime)
 
+    def reset(self, params):
+        self.params = params
         # tracks states internally
         self.o1 = 0
         self.l1 = 0
         self.o2 = 0
         self.l2 = 0
         self.time = 0 # in seconds
+        self.quoted = None
+        self.series_x, self.series_y = [], []
+
+    def getFruitValues(self, o1, l1, o2, l2):
+        self.o1 = o1
+        self.l1 = l1
+        self.o2 = o2
+        self.l2 = l2
+    
+    def getTime(self, time):
+        self.time = time
+
+    def update(self):
+        totalOranges = self.o1 + self.o2
+        totalLemons = self.l1 + self.l2
+        T = GAMETIME - self.time
+        p_o1, p_l1, p_o2, p_l2 = self.params.noisyProbs
+        expectedOranges = T * (p_o1 + p_o2)
+        expectedLemons = T * (p_l1 + p_l2)
+        ev = totalOranges * totalLemons
+        ev += totalOranges * expectedLemons
+        ev += totalLemons * expectedOranges
+        ev += expectedOranges * expectedLemons
+
+        # --- 2. initialise quoted price once ----------------------------------
+        if self.quoted is None:
+            self.quoted = ev
+
+        # --- 3. volatility that decays as √(T/T₀) -----------------------------
+        T = max(0, GAMETIME - self.time)
+        sigma = max(self.SIGMA_FLOOR, self.SIGMA0 * math.sqrt(T / GAMETIME))
+
+        # --- 4. OU one‑step update -------------------------------------------
+        noise   = self.params.rng.gauss(0, sigma)
+        self.quoted += self.K_REVERT * (ev - self.quoted) + noise
+        self.quoted = max(0, self.quoted)           # no negative prices
+
+        # --- 5. push into series ----------------------------------------------
+        self.series_x.append(self.time)
+        self.series_y.append(self.quoted)
+
+        if len(self.series_x) > self.WINDOW:
+            self.series_x = self.series_x[-self.WINDOW:]
+            self.series_y = self.series_y[-self.WINDOW:]
+        return self.quoted
+
+
+class TrackerInfo(QFrame):
+    def __init__(self, params):
+        super().__init__()
+        # matplotlib is only loaded by the Qt window, the terminal UI never needs it
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+        import matplotlib.pyplot as plt
+        from matplotlib.ticker import MaxNLocator
+
+        # underlying value
+        self.underlyingValue = 0
+        self.underlying = Underlying(params)
 
         self.setFixedSize(WIDTH//2.5 - MARGIN, HEIGHT//1.5 - MARGIN)
         self.setFrameShape(QFrame.StyledPanel)
@@ -163,7 +498,6 @@ class TrackerInfo(QFrame):
         self.canvas = FigureCanvas(self.fig)
         self.canvas.setFixedSize(WIDTH//2.5 - MARGIN, HEIGHT//2.75 + MARGIN)
         self.layout.addWidget(self.canvas)
-        self.series_x, self.series_y = [], []
 
 
         self.buttonsLayout = QHBoxLayout()
@@ -177,9 +511,6 @@ class TrackerInfo(QFrame):
         self.layout.addWidget(self.underlyingInfoLabel)
         self.layout.addLayout(self.buttonsLayout)
 
-        signals.fruitChanges.connect(self.getFruitValues)
-        signals.timeChanged.connect(self.getTime)
-
         self.timer = QTimer()
         self.timer.timeout.connect(self.updateUnderlying)
         self.timer.start(1000)
@@ -192,64 +523,51 @@ class TrackerInfo(QFrame):
     def sell(self):
         signals.sell.emit(float(self.underlyingValue))
 
-    def getFruitValues(self, o1, l1, o2, l2):
-        self.o1 = o1
-        self.l1 = l1
-        self.o2 = o2
-        self.l2 = l2
-    
-    def getTime(self, time):
-        self.time = time
-
     def updateUnderlying(self):
-        K_REVERT = 0.4                # 0–1  : 0 = pure random walk, 1 = snap to EV
-        SIGMA0   = 1.8                 # base volatility
-        SIGMA_FLOOR = 1.0
-        totalOranges = self.o1 + self.o2
-        totalLemons = self.l1 + self.l2
-        T = GAMETIME - self.time
-        expectedOranges = T * (O1PROB_NOISY + O2PROB_NOISY)
-        expectedLemons = T * (L1PROB_NOISY + L2PROB_NOISY)
-        ev = totalOranges * totalLemons
-        ev += totalOranges * expectedLemons
-        ev += totalLemons * expectedOranges
-        ev += expectedOranges * expectedLemons
-        self.underlyingValue = ev
+        self.underlyingValue = self.underlying.update()
         self.underlyingInfoLabel.setText(f"{self.underlyingValue:,.2f}")
 
-        # --- 2. initialise quoted price once ----------------------------------
-        if not hasattr(self, "quoted"):
-            self.quoted = ev
+        self.line.set_data(self.underlying.series_x, self.underlying.series_y)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.canvas.draw_idle()
 
-        # --- 3. volatility that decays as √(T/T₀) -----------------------------
-        T = max(0, GAMETIME - self.time)
-        sigma = max(SIGMA_FLOOR, SIGMA0 * math.sqrt(T / GAMETIME))
+    def reset(self, params):
+        self.underlying.reset(params)
+        self.timer.start(1000)
+        self.updateUnderlying()
+    
+    def stop(self):
+        self.timer.stop()
 
-        # --- 4. OU one‑step update -------------------------------------------
-        noise   = random.gauss(0, sigma)
-        self.quoted += K_REVERT * (ev - self.quoted) + noise
-        self.quoted = max(0, self.quoted)           # no negative prices
-        
-        self.underlyingValue = self.quoted
-        # --- 5. push into series & UI ----------------------------------------
-        self.series_x.append(self.time)
-        self.series_y.append(self.quoted)
-        self.underlyingInfoLabel.setText(f"{self.quoted:,.2f}")
 
-        WINDOW = 30
+class Clock(QObject):
+    """Game clock, ticks timeChanged once a second and gameOver at GAMETIME."""
+    def __init__(self):
+        super().__init__()
+        self.time = 0
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.tick)
+        self.timer.start(1000)
 
-        if len(self.series_x) > WINDOW:
-            self.series_x = self.series_x[-WINDOW:]
-            self.series_y = self.series_y[-WINDOW:]
+        self.tick()
 
-        self.line.set_data(self.series_x, self.series_y)
-        self.ax.relim()
-        self.ax.autoscale_view()
-        self.canvas.draw_idle()
-    
     def stop(self):
         self.timer.stop()
 
+    def reset(self):
+        self.time = 0
+        self.timer.start(1000)
+        self.tick()
+
+    def tick(self):
+        self.time += 1
+        signals.timeChanged.emit(self.time)
+
+        if self.time == GAMETIME:
+            signals.gameOver.emit()
+
 
 class TimeInfo(QFrame):
     def __init__(self):
@@ -260,27 +578,23 @@ class TimeInfo(QFrame):
         self.layout = QVBoxLayout()
         self.setLayout(self.layout)
 
-        self.time = 0
-
         self.timeLabel = QLabel()
         self.timeLabel.setStyleSheet("font-size: 64px;")
         self.timeLabel.setAlignment(Qt.AlignCenter)
         self.layout.addWidget(self.timeLabel)
 
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.updateTime)
-        self.timer.start(1000)
-
-        self.updateTime()
+        signals.timeChanged.connect(self.updateTime)
+        self.clock = Clock()
     
     def stop(self):
-        self.timer.stop()
+        self.clock.stop()
 
+    def reset(self):
+        self.clock.reset()
     
-    def updateTime(self):
-        self.time += 1
-        seconds = self.time % 60
-        minutes = self.time // 60
+    def updateTime(self, time):
+        seconds = time % 60
+        minutes = time // 60
         if seconds < 10 and minutes < 10:
             self.timeLabel.setText(f"0{minutes} : 0{seconds}")
         elif seconds < 10:
@@ -289,11 +603,6 @@ class TimeInfo(QFrame):
             self.timeLabel.setText(f"0{minutes} : {seconds}")
         else:
             self.timeLabel.setText(f"{minutes} : {seconds}")
-        
-        signals.timeChanged.emit(self.time)
-
-        if self.time == GAMETIME:
-            signals.gameOver.emit()
             
 
 class PlayerInfo(QFrame):
@@ -317,8 +626,9 @@ class PlayerInfo(QFrame):
 
 
 class Fruits(QObject):
-    def __init__(self):
+    def __init__(self, params):
         super().__init__()
+        self.params = params
         self.oranges1 = 0
         self.lemons1 = 0
         self.oranges2 = 0
@@ -331,27 +641,89 @@ class Fruits(QObject):
         self.updateFruit()
     
     def updateFruit(self):
-        if O1PROB > random.random():
+        p_o1, p_l1, p_o2, p_l2 = self.params.probs
+        rng = self.params.rng
+        if p_o1 > rng.random():
             self.oranges1 += 1
-        if L1PROB > random.random():
+        if p_l1 > rng.random():
             self.lemons1 += 1
-        if O2PROB > random.random():
+        if p_o2 > rng.random():
             self.oranges2 += 1
-        if L2PROB > random.random():
+        if p_l2 > rng.random():
             self.lemons2 += 1
         signals.fruitChanges.emit(self.oranges1, self.lemons1, self.oranges2, self.lemons2)
 
     def stop(self):
         self.timer.stop()
+
+    def reset(self, params):
+        self.params = params
+        self.oranges1 = 0
+        self.lemons1 = 0
+        self.oranges2 = 0
+        self.lemons2 = 0
+        self.timer.start(1000)
+        self.updateFruit()
     
     def fruitValues(self):
         return (self.oranges1, self.lemons1, self.oranges2, self.lemons2)
 
-class FruitInfo(QFrame):
-    def __init__(self):
+class RateEstimator(QObject):
+    """
+    Online Beta-Bernoulli posterior over each team's per-second orange and lemon
+    probability, in the (o1, l1, o2, l2) order of fruitChanges. The prior is built
+    from the market history runs and every fruitChanges tick is one more trial,
+    so an update only looks at the change since the last tick.
+    """
+    def __init__(self, runs=()):
         super().__init__()
+        self.reset(runs)
+        signals.fruitChanges.connect(self.update)
+
+    def reset(self, runs=()):
+        self.alpha = [1.0] * 4
+        self.beta = [1.0] * 4
+        for run in runs:
+            for i, count in enumerate(run):
+                self.alpha[i] += count
+                self.beta[i] += GAMETIME - count
+        self.last = [0] * 4
+        self.ticks = 0
+
+    def update(self, o1, l1, o2, l2):
+        for i, count in enumerate((o1, l1, o2, l2)):
+            hits = count - self.last[i]
+            self.alpha[i] += hits
+            self.beta[i] += 1 - hits
+            self.last[i] = count
+        self.ticks += 1
+        signals.estimatesChanged.emit(self)
+
+    def mean(self, i):
+        """Posterior mean probability of a fruit landing in one second."""
+        return self.alpha[i] / (self.alpha[i] + self.beta[i])
+
+    def std(self, i):
+        a, b = self.alpha[i], self.beta[i]
+        return math.sqrt(a * b / ((a + b) ** 2 * (a + b + 1)))
+
+    def rates(self):
+        return tuple(self.mean(i) for i in range(4))
+
+    def remaining(self):
+        return max(0, GAMETIME - self.ticks)
+
+    def expectedFinal(self, i):
+        """Posterior predictive (mean, std) of the final count, beta-binomial over the remaining seconds."""
+        a, b = self.alpha[i], self.beta[i]
+        T = self.remaining()
+        variance = T * a * b * (a + b + T) / ((a + b) ** 2 * (a + b + 1))
+        return self.last[i] + T * self.mean(i), math.sqrt(variance)
 
-        self.fruits = Fruits()
+
+class FruitInfo(QFrame):
+    def __init__(self, params):
+        super().__init__()
 
         self.setFixedSize(WIDTH//2.5 - MARGIN, HEIGHT//3 - MARGIN)
         self.setFrameShape(QFrame.StyledPanel)
@@ -390,10 +762,22 @@ class FruitInfo(QFrame):
         self.bannerLayout.addWidget(self.team1Label)
         self.bannerLayout.addWidget(self.team2Label)
 
+        self.estimatesLayout = QHBoxLayout()
+        self.estimateLabels = [QLabel() for _ in range(4)]
+        for label in self.estimateLabels:
+            label.setStyleSheet("font-size: 14px;")
+            label.setAlignment(Qt.AlignCenter)
+            self.estimatesLayout.addWidget(label)
+
         signals.fruitChanges.connect(self.updateFruitLabels)
+        signals.estimatesChanged.connect(self.updateEstimateLabels)
 
         self.layout.addLayout(self.bannerLayout)
         self.layout.addLayout(self.teamsLayout)
+        self.layout.addLayout(self.estimatesLayout)
+
+        # created last so its first fruitChanges tick reaches the labels above
+        self.fruits = Fruits(params)
     
     def updateFruitLabels(self, o1, l1, o2, l2):
         self.team1Oranges.setText(f"Oranges: {o1}")
@@ -401,10 +785,16 @@ class FruitInfo(QFrame):
         self.team2Oranges.setText(f"Oranges: {o2}")
         self.team2Lemons.setText(f"Lemons: {l2}")
 
+    def updateEstimateLabels(self, estimator):
+        for i, label in enumerate(self.estimateLabels):
+            mean, std = estimator.expectedFinal(i)
+            label.setText(f"final ≈ {mean:.1f} ± {std:.1f}")
+
 
 class TradeSection(QFrame):
-    def __init__(self):
+    def __init__(self, params):
         super().__init__()
+        self.params = params
         self.setFixedSize(WIDTH//2.5 - MARGIN, HEIGHT//1.5 - MARGIN)
         self.setFrameShape(QFrame.StyledPanel)
         self.layout = QVBoxLayout()
@@ -418,6 +808,7 @@ class TradeSection(QFrame):
         scrollArea.setWidget(scrollContent)
         self.layout.addWidget(scrollArea)
         
+        self.offers = []
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.addTrade)
         self.scheduleTrade()
@@ -441,16 +832,16 @@ class TradeSection(QFrame):
         self.l2 = l2
 
     def scheduleTrade(self):
-        delay = max((GAMETIME*1000)//15, (GAMETIME*1000)//15 + random.randint(-4000, 4000))
-        self.timer.start(delay)
+        self.timer.start(next_trade_delay(self.params))
 
     def addTrade(self):
-        for _ in range(random.randint(1,3)):
+        for offer in offer_batch(self.params, (self.time, self.o1, self.l1, self.o2, self.l2)):
             wrapper = QWidget()
             hbox = QHBoxLayout()
             hbox.setContentsMargins(0, 0, 0, 0)
             hbox.setAlignment(Qt.AlignHCenter)
-            trade = TradeUI((self.time, self.o1, self.l1, self.o2, self.l2))
+            trade = TradeUI(offer)
+            self.offers.append(offer)
             hbox.addWidget(trade)
             wrapper.setLayout(hbox)
             self.scrollLayout.addWidget(wrapper)
@@ -459,23 +850,100 @@ class TradeSection(QFrame):
     def stop(self):
         self.timer.stop()
 
+    def reset(self, params):
+        self.params = params
+        while self.scrollLayout.count():
+            self.scrollLayout.takeAt(0).widget().deleteLater()
+        self.offers = []
+        self.o1 = 0
+        self.o2 = 0
+        self.l1 = 0
+        self.l2 = 0
+        self.time = 0
+        self.scheduleTrade()
+
     
 class Trade:
-    def __init__(self, func, values, text):
+    def __init__(self, func, values, text, params=None, value=None, timeLimit=None):
         time, o1, l1, o2, l2 = values
         self.text = text
         self.func = func
-        T = GAMETIME - time
-        o1 += T * O1PROB_NOISY
-        l1 += T * L1PROB_NOISY
-        o2 += T * O2PROB_NOISY
-        l2 += T * L2PROB_NOISY
-        self.value = int(func(o1, l1, o2, l2))
+        self.time = time
+        self.timeLimit = timeLimit
+        if value is None:
+            T = GAMETIME - time
+            p_o1, p_l1, p_o2, p_l2 = params.noisyProbs
+            o1 += T * p_o1
+            l1 += T * p_l1
+            o2 += T * p_o2
+            l2 += T * p_l2
+            value = int(func(o1, l1, o2, l2))
+        self.value = value
         self.side = Side.IGNORED
 
+    def expiresIn(self, time):
+        """Seconds left at game time `time` before this offer expires."""
+        return self.time + self.timeLimit - time
+
+    def expired(self, time):
+        return self.expiresIn(time) <= 0
+
+UNDERLYING = ("total oranges * total lemons", lambda o1, l1, o2, l2: (o1 + o2) * (l1 + l2))
+
+def underlying_trade(time, side, price):
+    """A buy or sell of the underlying at the quoted price, so it can be stored like any other trade."""
+    text, func = UNDERLYING
+    trade = Trade(func, (time, 0, 0, 0, 0), text, value=price)
+    trade.side = side
+    return trade
+
+
+TRADE_TYPES = [
+    ("2 ^ (team 1 oranges)", lambda o1, l1, o2, l2: 2**o1),
+    ("2 ^ (team 2 oranges)", lambda o1, l1, o2, l2: 2**o2),
+    ("2 ^ (team 1 lemons)", lambda o1, l1, o2, l2: 2**l1),
+    ("2 ^ (team 2 lemons)", lambda o1, l1, o2, l2: 2**l2),
+
+    ("team 1 oranges + team 2 oranges", lambda o1, l1, o2, l2: o1 + o2),
+    ("team 1 oranges - team 2 oranges", lambda o1, l1, o2, l2: o1 - o2),
+    ("team 2 oranges - team 1 oranges", lambda o1, l1, o2, l2: o2 - o1),
+    ("team 1 oranges * team 2 oranges", lambda o1, l1, o2, l2: o1 * o2),
+
+    ("team 1 lemons + team 2 lemons", lambda o1, l1, o2, l2: l1 + l2),
+    ("team 1 lemons * team 2 lemons", lambda o1, l1, o2, l2: l1 * l2),
+    ("team 1 lemons - team 2 lemons", lambda o1, l1, o2, l2: l1 - l2),
+    ("team 2 lemons - team 1 lemons", lambda o1, l1, o2, l2: l2 - l1),
+
+    ("team 1 oranges + team 2 lemons", lambda o1, l1, o2, l2: o1 + l2),
+    ("team 1 oranges - team 2 lemons", lambda o1, l1, o2, l2: o1 - l2),
+    ("team 2 lemons - team 1 oranges", lambda o1, l1, o2, l2: l2 - o1),
+    ("team 1 oranges * team 2 lemons", lambda o1, l1, o2, l2: o1 * l2),
+
+    ("team 2 oranges + team 1 lemons", lambda o1, l1, o2, l2: o2 + l1),
+    ("team 2 oranges - team 1 lemons", lambda o1, l1, o2, l2: o2 - l1),
+    ("team 1 lemons - team 2 oranges", lambda o1, l1, o2, l2: l1 - o2),
+    ("team 2 oranges * team 1 lemons", lambda o1, l1, o2, l2: o2 * l1),
+]
+
+TRADE_TIME_LIMITS = [max(GAMETIME//45, 10), max(GAMETIME//30, 10), max(GAMETIME//7.5, 10), max(GAMETIME//15, 10)]
+
+def next_trade_delay(params):
+    """Milliseconds until the next batch of offers."""
+    return max((GAMETIME*1000)//15, (GAMETIME*1000)//15 + params.rng.randint(-4000, 4000))
+
+def random_trade(params, values):
+    """Draw a contract and expiry and price it from (time, o1, l1, o2, l2)."""
+    timeLimit = int(params.rng.choice(TRADE_TIME_LIMITS))
+    text, func = params.rng.choice(TRADE_TYPES)
+    return Trade(func, values, text, params, timeLimit=timeLimit)
+
+def offer_batch(params, values):
+    """The 1 to 3 offers shown together each time the offer timer fires."""
+    return [random_trade(params, values) for _ in range(params.rng.randint(1,3))]
+
 
 class TradeUI(QFrame):
-    def __init__(self, values):
+    def __init__(self, trade):
         super().__init__()
         self.layout = QVBoxLayout()
         self.setLayout(self.layout)
@@ -483,37 +951,9 @@ class TradeUI(QFrame):
         self.setFrameStyle(QFrame.Box | QFrame.Shadow.Raised)
         self.setFixedSize(450, 140)
 
-        tradeTypes = [
-            ("2 ^ (team 1 oranges)", lambda o1, l1, o2, l2: 2**o1),
-            ("2 ^ (team 2 oranges)", lambda o1, l1, o2, l2: 2**o2),
-            ("2 ^ (team 1 lemons)", lambda o1, l1, o2, l2: 2**l1),
-            ("2 ^ (team 2 lemons)", lambda o1, l1, o2, l2: 2**l2),
-
-            ("team 1 oranges + team 2 oranges", lambda o1, l1, o2, l2: o1 + o2),
-            ("team 1 oranges - team 2 oranges", lambda o1, l1, o2, l2: o1 - o2),
-            ("team 2 oranges - team 1 oranges", lambda o1, l1, o2, l2: o2 - o1),
-            ("team 1 oranges * team 2 oranges", lambda o1, l1, o2, l2: o1 * o2),
-
-            ("team 1 lemons + team 2 lemons", lambda o1, l1, o2, l2: l1 + l2),
-            ("team 1 lemons * team 2 lemons", lambda o1, l1, o2, l2: l1 * l2),
-            ("team 1 lemons - team 2 lemons", lambda o1, l1, o2, l2: l1 - l2),
-            ("team 2 lemons - team 1 lemons", lambda o1, l1, o2, l2: l2 - l1),
-
-            ("team 1 oranges + team 2 lemons", lambda o1, l1, o2, l2: o1 + l2),
-            ("team 1 oranges - team 2 lemons", lambda o1, l1, o2, l2: o1 - l2),
-            ("team 2 lemons - team 1 oranges", lambda o1, l1, o2, l2: l2 - o1),
-            ("team 1 oranges * team 2 lemons", lambda o1, l1, o2, l2: o1 * l2),
-   
-            ("team 2 oranges + team 1 lemons", lambda o1, l1, o2, l2: o2 + l1),
-            ("team 2 oranges - team 1 lemons", lambda o1, l1, o2, l2: o2 - l1),
-            ("team 1 lemons - team 2 oranges", lambda o1, l1, o2, l2: l1 - o2),
-            ("team 2 oranges * team 1 lemons", lambda o1, l1, o2, l2: o2 * l1),
-        ]
-
-        self.timeLimit = int(random.choice([max(GAMETIME//45, 10),max(GAMETIME//30, 10), max(GAMETIME//7.5, 10), max(GAMETIME//15, 10)]))
-        self.tradeText, func = random.choice(tradeTypes)
-
-        self.trade = Trade(func, values, self.tradeText)
+        self.trade = trade
+        self.timeLimit = self.trade.timeLimit
+        self.tradeText = self.trade.text
 
         self.price = self.trade.value
 
@@ -535,15 +975,14 @@ class TradeUI(QFrame):
         self.layout.addLayout(self.buttonLayout)
 
         # timer related
-        self.time = 0
         signals.timeChanged.connect(self.updateTime)
 
-    def updateTime(self):
-        self.time += 1
-        if self.time >= self.timeLimit - 10:
+    def updateTime(self, time):
+        remaining = self.trade.expiresIn(time)
+        if remaining <= 10:
             self.tradeInfo.setStyleSheet("color: #ED2939; font-size: 20px;")
-        self.tradeInfo.setText(f"{self.tradeText} @ {self.price}\nexpires in {self.timeLimit - self.time}")
-        if self.time >= self.timeLimit:
+        self.tradeInfo.setText(f"{self.tradeText} @ {self.price}\nexpires in {remaining}")
+        if self.trade.expired(time):
             self.setVisible(False)
         
     def buy(self):
@@ -557,7 +996,7 @@ class TradeUI(QFrame):
         self.setVisible(False)
 
 class MarketHistoryDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, params, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Market History")
         self.setFixedSize(550, 415)
@@ -576,8 +1015,10 @@ class MarketHistoryDialog(QDialog):
         l1results = []
         o2results = []
         l2results = []
+        self.runs = []
         for i in range(10):
-            o1, l1, o2, l2 = simulate_final_counts()
+            o1, l1, o2, l2 = simulate_final_counts(params)
+            self.runs.append((o1, l1, o2, l2))
             o1results.append(o1)
             l1results.append(l1)
             o2results.append(o2)
@@ -625,8 +1066,8 @@ class MarketHistoryDialog(QDialog):
         start_btn.clicked.connect(self.accept)
 
 class Window(QWidget):
-    def __init__(self):
-        self.player = Player()  
+    def __init__(self, store=None, params=None, runs=()):
+        self.session = Session(store, "qt", params, runs)
         super().__init__()
         self.setWindowTitle("Fruit Market Making")
         self.setFixedSize(WIDTH,HEIGHT)
@@ -634,10 +1075,11 @@ class Window(QWidget):
         self.layout = QGridLayout()
         self.setLayout(self.layout)
 
-        self.tradeSection = TradeSection()
-        self.trackerInfo = TrackerInfo()
+        params = self.session.params
+        self.tradeSection = TradeSection(params)
+        self.trackerInfo = TrackerInfo(params)
         self.timeInfo = TimeInfo()
-        self.fruitInfo = FruitInfo()
+        self.fruitInfo = FruitInfo(params)
         self.tradeHistory = TradeHistory()
 
         self.layout.addWidget(self.tradeSection, 0, 0)
@@ -654,10 +1096,10 @@ class Window(QWidget):
         self.timeInfo.stop()
         self.fruitInfo.fruits.stop()
 
-        score = self.player.calculateScore(self.fruitInfo.fruits.fruitValues())
+        score = self.session.endRound(self.fruitInfo.fruits.fruitValues(), self.tradeSection.offers)
         dialog = QDialog(self)
         dialog.setWindowTitle("Profit and Loss")
-        dialog.setFixedSize(200, 200)
+        dialog.setFixedSize(260, 260)
 
         layout = QVBoxLayout(dialog)
 
@@ -670,24 +1112,52 @@ class Window(QWidget):
             scoreLabel.setStyleSheet("color: #FFFFFF; font-size: 22px;")
         scoreLabel.setAlignment(Qt.AlignCenter)
 
+        sessionLabel = QLabel(self.session.summary())
+        sessionLabel.setStyleSheet("font-size: 14px;")
+        sessionLabel.setAlignment(Qt.AlignCenter)
+
         buttonLayout = QHBoxLayout()
+        againButton = QPushButton("Play Again")
+        againButton.setStyleSheet("font-size: 18px; padding: 6px 16px;")
         quitButton = QPushButton("Quit")
         quitButton.setStyleSheet("font-size: 18px; padding: 6px 16px;")
         buttonLayout.addStretch()
+        buttonLayout.addWidget(againButton)
         buttonLayout.addWidget(quitButton)
         buttonLayout.addStretch()
 
         layout.addWidget(scoreLabel)
+        layout.addWidget(sessionLabel)
         layout.addLayout(buttonLayout)
 
+        againButton.clicked.connect(dialog.accept)
         quitButton.clicked.connect(dialog.reject)
 
-        if dialog.exec() == QDialog.Rejected:
+        result = dialog.exec()
+        dialog.deleteLater()
+        if result == QDialog.Accepted:
+            # restart once the gameOver emission has unwound
+            QTimer.singleShot(0, self.restartGame)
+        else:
             QApplication.quit()
     
     def restartGame(self):
-        print("Restarting...")
-        os.execl(sys.executable, sys.executable, *sys.argv)
+        # new round in-process: redraw parameters and reset every component in place
+        self.session.newRound()
+        params = self.session.params
+        history = MarketHistoryDialog(params, self)
+        accepted = history.exec() == QDialog.Accepted
+        history.deleteLater()
+        if not accepted:
+            QApplication.quit()
+            return
+
+        self.session.startRound(history.runs)
+        self.tradeHistory.reset()
+        self.tradeSection.reset(params)
+        self.trackerInfo.reset(params)
+        self.timeInfo.reset()
+        self.fruitInfo.fruits.reset(params)
 
 class Player(QObject):
     def __init__(self):
@@ -695,7 +1165,10 @@ class Player(QObject):
         self.balance = 0.0
         self.position = 0
         self.trades: Trade = []
+        self.underlyingTrades: Trade = []
+        self.time = 0
         signals.traded.connect(self.addTrade)
+        signals.timeChanged.connect(self.updateTime)
         signals.buy.connect(self.buy)
         signals.sell.connect(self.sell)
 
@@ -716,6 +1189,14 @@ class Player(QObject):
 
         return result
     
+    def reset(self):
+        self.balance = 0.0
+        self.position = 0
+        self.trades = []
+        self.underlyingTrades = []
+        self.time = 0
+        signals.balanceChanged.emit(self.balance)
+
     def updateBalance(self, val):
         self.balance += val
         signals.balanceChanged.emit(self.balance)
@@ -723,15 +1204,296 @@ class Player(QObject):
     def addTrade(self, trade):
         self.trades.append(trade)
 
+    def updateTime(self, time):
+        self.time = time
+
     def sell(self, val):
         self.position -= 1
         self.updateBalance(val)
+        self.underlyingTrades.append(underlying_trade(self.time, Side.SELL, val))
     
     def buy(self, val):
         self.position += 1
         self.updateBalance(-val)
+        self.underlyingTrades.append(underlying_trade(self.time, Side.BUY, val))
+
+SPARK = "▁▂▃▄▅▆▇█"
+
+def sparkline(values):
+    if not values:
+        return ""
+    lo, hi = min(values), max(values)
+    span = (hi - lo) or 1
+    return "".join(SPARK[int((v - lo) / span * (len(SPARK) - 1))] for v in values)
+
+def format_time(seconds):
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+class TerminalUI(QObject):
+    """
+    curses front end driven by the same Clock, Fruits, Underlying, Player and
+    offer drawing as the Qt window. Only lines that changed since the last
+    frame are written to the terminal.
+    """
+    def __init__(self, stdscr, store=None, seed=None):
+        super().__init__()
+        self.stdscr = stdscr
+        params = GameParameters(seed)
+        self.runs = [simulate_final_counts(params) for _ in range(10)]
+        self.session = Session(store, "terminal", params, self.runs)
+
+        # game components are built on the first round and reset afterwards
+        self.clock = None
+        self.fruits = None
+        self.underlying = None
+
+        self.phase = "history"
+        self.counts = (0, 0, 0, 0)
+        self.time = 0
+        self.offers = []
+        self.offered = []
+        self.selected = 0
+        self.history = []
+        self.score = 0.0
+        self.drawn = {}
+        self.dirty = True
+
+        curses.curs_set(0)
+        self.stdscr.nodelay(True)
+        self.stdscr.keypad(True)
+
+        signals.fruitChanges.connect(self.updateFruits)
+        signals.timeChanged.connect(self.updateTime)
+        signals.gameOver.connect(self.stopGame)
+        signals.buy.connect(self.captureBuy)
+        signals.sell.connect(self.captureSell)
+        signals.traded.connect(self.captureTrade)
+        signals.balanceChanged.connect(self.markDirty)
+
+        self.offerTimer = QTimer(self)
+        self.offerTimer.timeout.connect(self.addOffers)
+        self.quoteTimer = QTimer(self)
+        self.quoteTimer.timeout.connect(self.updateQuote)
+
+        self.inputTimer = QTimer(self)
+        self.inputTimer.timeout.connect(self.poll)
+        self.inputTimer.start(50)
+        self.poll()
+
+    def run(self):
+        return QCoreApplication.instance().exec()
+
+    # -- game -------------------------------------------------------------
+    def startRound(self):
+        self.phase = "playing"
+        self.offers = []
+        self.offered = []
+        self.selected = 0
+        self.history = []
+        self.session.startRound(self.runs)
+        params = self.session.params
+        self.offerTimer.start(next_trade_delay(params))
+        self.quoteTimer.start(1000)
+        if self.clock is None:
+            self.underlying = Underlying(params)
+            self.updateQuote()
+            self.clock = Clock()
+            self.fruits = Fruits(params)
+        else:
+            self.underlying.reset(params)
+            self.updateQuote()
+            self.clock.reset()
+            self.fruits.reset(params)
+
+    def newRound(self):
+        self.session.newRound()
+        self.runs = [simulate_final_counts(self.session.params) for _ in range(10)]
+        self.phase = "history"
+        self.dirty = True
+
+    def stopGame(self):
+        self.offerTimer.stop()
+        self.quoteTimer.stop()
+        self.clock.stop()
+        self.fruits.stop()
+
+        self.score = self.session.endRound(self.fruits.fruitValues(), self.offered)
+        self.phase = "over"
+        self.dirty = True
+
+    def updateFruits(self, o1, l1, o2, l2):
+        self.counts = (o1, l1, o2, l2)
+        self.dirty = True
+
+    def updateTime(self, time):
+        self.time = time
+        self.offers = [offer for offer in self.offers if not offer.expired(time)]
+        self.selected = min(self.selected, max(0, len(self.offers) - 1))
+        self.dirty = True
+
+    def updateQuote(self):
+        self.underlying.update()
+        self.dirty = True
+
+    def addOffers(self):
+        params = self.session.params
+        batch = offer_batch(params, (self.time,) + self.counts)
+        self.offers.extend(batch)
+        self.offered.extend(batch)
+        self.offerTimer.start(next_trade_delay(params))
+        self.dirty = True
+
+    def tradeSelected(self, side):
+        if not self.offers:
+            return
+        trade = self.offers.pop(self.selected)
+        trade.side = side
+        signals.traded.emit(trade)
+        self.selected = min(self.selected, max(0, len(self.offers) - 1))
+
+    def captureBuy(self, price):
+        self.history.insert(0, f"Buy  total oranges * total lemons @ {price:.2f}")
+
+    def captureSell(self, price):
+        self.history.insert(0, f"Sell total oranges * total lemons @ {price:.2f}")
+
+    def captureTrade(self, trade):
+        action = 'Buy ' if trade.side == Side.BUY else 'Sell'
+        self.history.insert(0, f"{action} {trade.text} @ {trade.value}")
+        self.dirty = True
+
+    def markDirty(self, *args):
+        self.dirty = True
+
+    # -- input ------------------------------------------------------------
+    def poll(self):
+        key = self.stdscr.getch()
+        while key != -1:
+            self.handleKey(key)
+            key = self.stdscr.getch()
+        if self.dirty:
+            self.render()
+
+    def handleKey(self, key):
+        self.dirty = True
+        if key == curses.KEY_RESIZE:
+            self.drawn = {}
+            self.stdscr.clear()
+        elif key == ord("q"):
+            QCoreApplication.quit()
+        elif self.phase == "history":
+            if key in (curses.KEY_ENTER, 10, 13):
+                self.startRound()
+        elif self.phase == "over":
+            if key == ord("r"):
+                self.newRound()
+        elif key == ord("b"):
+            signals.buy.emit(float(self.underlying.quoted))
+        elif key == ord("s"):
+            signals.sell.emit(float(self.underlying.quoted))
+        elif key in (curses.KEY_UP, ord("k")):
+            self.selected = max(0, self.selected - 1)
+        elif key in (curses.KEY_DOWN, ord("j")):
+            self.selected = min(max(0, len(self.offers) - 1), self.selected + 1)
+        elif key == ord("B"):
+            self.tradeSelected(Side.BUY)
+        elif key == ord("S"):
+            self.tradeSelected(Side.SELL)
+
+    # -- drawing ----------------------------------------------------------
+    def render(self):
+        self.dirty = False
+        height, width = self.stdscr.getmaxyx()
+        lines = self.compose()[:height]
+        lines += [""] * (height - len(lines))
+        for row, text in enumerate(lines):
+            text = text[:width - 1].ljust(width - 1)
+            if self.drawn.get(row) != text:
+                self.stdscr.addstr(row, 0, text)
+                self.drawn[row] = text
+        self.stdscr.refresh()
+
+    def formatEstimate(self, i):
+        mean, std = self.session.rateEstimator.expectedFinal(i)
+        return f"{self.counts[i]:>3} (≈{mean:.1f} ± {std:.1f})"
+
+    def compose(self):
+        title = f"Oranges and Lemons   Round {self.session.round}"
+        if self.phase == "history":
+            lines = [title, "", "Market history", f"{'Run':>4}{'T1 oranges':>12}{'T1 lemons':>12}{'T2 oranges':>12}{'T2 lemons':>12}"]
+            for i, run in enumerate(self.runs):
+                lines.append(f"{i + 1:>4}" + "".join(f"{count:>12}" for count in run))
+            totals = [sum(column) for column in zip(*self.runs)]
+            lines.append(f"{'Tot':>4}" + "".join(f"{total:>12}" for total in totals))
+            lines += ["", "enter: start trading   q: quit"]
+            return lines
+
+        if self.phase == "over":
+            return [title, "", f"Profit and Loss: {self.score:,.2f}", ""] + self.session.summary().splitlines() + [
+                "", "r: play again   q: quit"
+            ]
+
+        lines = [
+            f"{title}   {format_time(self.time)}   {format_time(max(0, GAMETIME - self.time))} left",
+            "",
+            f"{'':<10}{'Team 1':<22}{'Team 2':<22}",
+            f"{'Oranges':<10}{self.formatEstimate(0):<22}{self.formatEstimate(2):<22}",
+            f"{'Lemons':<10}{self.formatEstimate(1):<22}{self.formatEstimate(3):<22}",
+            "",
+            f"total oranges * total lemons  {self.underlying.quoted:,.2f}  {sparkline(self.underlying.series_y)}",
+            f"Position: {self.session.player.position:+d}   Balance: {self.session.player.balance:,.2f}",
+            "",
+            "Offers",
+        ]
+        for i, offer in enumerate(self.offers):
+            marker = ">" if i == self.selected else " "
+            lines.append(f"{marker} {offer.text} @ {offer.value}   expires in {offer.expiresIn(self.time)}")
+        if not self.offers:
+            lines.append("  (none)")
+        lines += ["", "Trades"] + [f"  {entry}" for entry in self.history[:10]]
+        lines += ["", "b/s: buy/sell underlying   up/down: select offer   B/S: buy/sell offer   q: quit"]
+        return lines
+
+
+def run_terminal(stdscr, store, seed=None):
+    return TerminalUI(stdscr, store, seed).run()
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Oranges and Lemons market making game")
+    parser.add_argument("--db", help="SQLite file games and trades are stored in, defaults to results.db in the user data directory")
+    parser.add_argument("--headless", type=int, metavar="GAMES", help="play GAMES games without a UI and store them")
+    parser.add_argument("--seed", type=int, help="seed of the first game; with --headless later games use seed + 1, seed + 2, ...")
+    parser.add_argument("--report", action="store_true", help="print P&L and pricing error summaries from the store")
+    parser.add_argument("--source", choices=["headless", "qt", "terminal"], help="only report games from this source")
+    parser.add_argument("--contract", help="only report pricing error for this contract, e.g. \"team 1 oranges + team 2 oranges\"")
+    parser.add_argument("--tui", action="store_true", help="play in the terminal instead of the Qt window")
+    args = parser.parse_args()
+
+    if args.headless or args.report:
+        store = ResultsStore(args.db)
+        if args.headless:
+            run_headless(store, args.headless, args.seed)
+        if args.report:
+            print_report(store, args.source, args.contract)
+        store.close()
+        sys.exit(0)
+
+    # saving results must never stop anyone from playing
+    try:
+        store = ResultsStore(args.db)
+    except (sqlite3.Error, OSError) as error:
+        print(f"Not saving results: {error}", file=sys.stderr)
+        store = None
+
+    if args.tui:
+        if curses is None:
+            parser.error("the terminal UI needs curses (pip install windows-curses on Windows)")
+        locale.setlocale(locale.LC_ALL, "")
+        app = QCoreApplication()
+        sys.exit(curses.wrapper(run_terminal, store, args.seed))
+
     if getattr(sys, 'frozen', False):
         # Running in PyInstaller bundle
         base_path = sys._MEIPASS
@@ -742,9 +1504,10 @@ if __name__ == "__main__":
     icon_path = os.path.join(base_path, "lemon.ico")
     app = QApplication()
     app.setWindowIcon(QIcon(icon_path))
-    history = MarketHistoryDialog()
+    params = GameParameters(args.seed)
+    history = MarketHistoryDialog(params)
     if history.exec() != QDialog.Accepted:
         sys.exit(0)   
-    window = Window()
+    window = Window(store, params, history.runs)
     window.show()
     sys.exit(app.exec())
\ No newline at end of file